@@ -1,13 +1,22 @@
-import os
 import sys
+from collections import deque
 from dataclasses import dataclass
-from queue import Queue
-from random import choice
+from itertools import repeat
+from operator import itemgetter
+from queue import Empty, Queue
+from random import choices
 from typing import Callable, Union
 
 from pynput import keyboard
 
 LETTERS = ("A", "B", "C")
+LETTER_BATCH = 1024
+EMPTY = ord("_")
+# Moves the terminal cursor home and erases everything below it, without forking `clear`
+CLEAR_SCREEN = "\x1b[H\x1b[J"
+# Translation tables mapping a letter's byte to 0 and every other byte to 1, so the
+# edges of a run of that letter can be found with a single `find`/`rfind` call
+RUN_MASKS = {ord(l): bytes(int(b != ord(l)) for b in range(256)) for l in LETTERS}
 
 @dataclass
 class Move:
@@ -35,8 +44,6 @@ class GameBoard:
     TO DO:
         - Implement a `starting_board` functionality so that a board can be populated from an existing file.
         - Implement some nicer representation of when letters get crushed (print them red, sleep, drop letters, print again)
-        - Fina a more performant way to print the board, I don't want to iterate through it each render if state hasn't changed
-            - of note can't cache the board
         - Find a more performant way to do letter destruction without passing a ton of data around
     """
     def __init__(self, width: int = 10, height: int = 10, 
@@ -47,19 +54,28 @@ class GameBoard:
                 "i": Move("i", "Drop Letter at Position", self.drop_letter),
                 "q": Move("q", "Leave Game", self.quit_game),
         }
+        self._valid_keys = frozenset(self._valid_moves)
         self._controls_string = '\n'.join([f'\t{m.key}: {m.description}' for m in self._valid_moves.values()])
 
         self.width = width
         self.height = height
         self.destroy_count = destroy_count
         self.cursor: int = width // 2
+        self._update_cursor_bars()
 
         self.board = self.build_board(starting_board)
+        self._row_cache: list[Union[str, None]] = [None] * height
+        self._letter_buf: list[str] = []
+        self._letter_idx = 0
         self.current_letter = self.get_letter()
 
         self.turn = 0
         self.score = 0
 
+        # Render state: cells changed since the last frame, and where the cursor was drawn
+        self._dirty: set[tuple[int, int]] = set()
+        self._drawn_cursor: Union[int, None] = None
+
         self.queue = Queue()
         self.listener = keyboard.Listener(on_press=self._on_press, suppress=True)
         self.listener.start()
@@ -68,20 +84,42 @@ class GameBoard:
 
     def __str__(self) -> str:
         """
-        A highly inefficient way to fetch and display the game board's state
+        Fetches and displays the game board's state, reusing the cursor bars cached by `_update_cursor_bars`
         """
         board = []
-        board.append("".join([" " if i != self.cursor else "|" for i in range(self.width)]) + f"Current Letter: {self.current_letter}")
-        board.append("".join([" " if i != self.cursor else "v" for i in range(self.width)]) + f"Turn: {self.turn}")
-        for j in range(self.height):
-            board.append("".join([self.board[(i,j)] for i in range(self.width)]))
-        board.append("".join([" " if i != self.cursor else "^" for i in range(self.width)]))
-        board.append("".join([" " if i != self.cursor else "|" for i in range(self.width)]) + f"Score: {self.score}")
+        board.append(self._cursor_bar + f"Current Letter: {self.current_letter}")
+        board.append(self._cursor_caret_v + f"Turn: {self.turn}")
+        h = self.height
+        row_cache = self._row_cache
+        for j in range(h):
+            row = row_cache[j]
+            if row is None:
+                row = row_cache[j] = self.board[j::h].decode()
+            board.append(row)
+        board.append(self._cursor_caret_up)
+        board.append(self._cursor_bar + f"Score: {self.score}")
         board.append(f"Controls:\n{self._controls_string}")
         board.append("Input: ")
         return "\n".join(board)
 
-    def build_board(self, starting_board: Union[str, None] = None) -> dict[tuple[int,int],str]:
+    def _update_cursor_bars(self) -> None:
+        """
+        Rebuilds the cursor marker lines drawn above and below the board.
+
+        These only change when `self.cursor` moves, so they are built here (called from
+        `__init__`, `cursor_left`, and `cursor_right`) rather than on every render.
+
+        Modifies:
+        `self._cursor_bar`
+        `self._cursor_caret_v`
+        `self._cursor_caret_up`
+        """
+        before, after = " " * self.cursor, " " * (self.width - self.cursor - 1)
+        self._cursor_bar = before + "|" + after
+        self._cursor_caret_v = before + "v" + after
+        self._cursor_caret_up = before + "^" + after
+
+    def build_board(self, starting_board: Union[str, None] = None) -> bytearray:
         """
         Builds the initial game board state and stores it, only caller is `__init__`.
 
@@ -92,31 +130,92 @@ class GameBoard:
         - starting_board: `Union[str, None]` - Currently raises NotImplementedError
 
         Returns:
-        `dict[tuple[int, int]str]` - Represents the board state
+        `bytearray` - Represents the board state, one byte per cell laid out column by column (see `_idx`)
         """
         if starting_board:
             raise NotImplementedError
-        return {(i,j):"_" for i in range(self.width) for j in range(self.height)}
+        return bytearray(b"_" * (self.width * self.height))
+
+    def _idx(self, x: int, y: int) -> int:
+        """
+        Maps an (x,y) coordinate pair onto its offset in the flat `self.board` buffer.
+
+        Returns:
+        `int` - The column-major index `x * height + y`
+
+        Columns are contiguous because the hot paths (vertical match scans, landing row
+        search, and dropping supported letters) all walk a single column.
+        """
+        return x * self.height + y
 
     def get_letter(self) -> str:
         """
-        Fetches a random letter from constant `LETTERS` using `random.choice`
+        Fetches a random letter from constant `LETTERS`.
+
+        Letters are drawn `LETTER_BATCH` at a time with `random.choices` and handed out one per call,
+        refilling the buffer once it runs out.
 
         Returns:
         `str` - Whatever random letter was selected from `LETTERS`
+
+        Modifies:
+        `self._letter_buf`
+        `self._letter_idx`
         """
-        return choice(LETTERS)
+        if self._letter_idx == len(self._letter_buf):
+            self._letter_buf = choices(LETTERS, k=LETTER_BATCH)
+            self._letter_idx = 0
+        letter = self._letter_buf[self._letter_idx]
+        self._letter_idx += 1
+        return letter
 
     def render(self) -> None:
         """
-        Clears out the terminal and prints the current board state to stdout.
+        Draws the current board state to stdout.
+
+        The first frame clears the terminal and writes the whole board. Every frame after
+        that uses ANSI cursor positioning to repaint only the cells in `self._dirty`, the
+        cursor markers (if the cursor moved), and the status text next to the board.
+
+        Either way the frame goes out as one `write` followed by one `flush`.
 
-        Works beautifully well on iTerm2, but some terminal emulators (such as Warp)
-        seem to struggle with clearing the screen and printing in the case of rapid
-        user input.
+        Modifies:
+        `self._dirty`
+        `self._drawn_cursor`
+        """
+        if self._drawn_cursor is None:
+            frame = CLEAR_SCREEN + str(self)
+        else:
+            frame = self._dirty_frame()
+        self._dirty.clear()
+        self._drawn_cursor = self.cursor
+        sys.stdout.write(frame)
+        sys.stdout.flush()
+
+    def _dirty_frame(self) -> str:
         """
-        os.system("clear")
-        print(self)
+        Builds the escape sequences that bring an already drawn frame up to date.
+
+        Board row `y` sits on terminal line `y + 3` (below the two cursor lines), and the
+        status text starts in the column right after the board.
+
+        Returns:
+        `str` - The partial frame to write to stdout
+        """
+        w, h = self.width, self.height
+        parts = [f"\x1b[{y + 3};{x + 1}H{chr(self.board[x * h + y])}" for x, y in self._dirty]
+
+        if self.cursor != self._drawn_cursor:
+            for line, marker in ((1, "|"), (2, "v"), (h + 3, "^"), (h + 4, "|")):
+                parts.append(f"\x1b[{line};{self._drawn_cursor + 1}H \x1b[{line};{self.cursor + 1}H{marker}")
+
+        parts.append(f"\x1b[1;{w + 1}HCurrent Letter: {self.current_letter}\x1b[K")
+        parts.append(f"\x1b[2;{w + 1}HTurn: {self.turn}\x1b[K")
+        parts.append(f"\x1b[{h + 4};{w + 1}HScore: {self.score}\x1b[K")
+
+        # Park the terminal cursor back after the "Input: " prompt
+        parts.append(f"\x1b[{h + 6 + len(self._valid_moves)};8H")
+        return "".join(parts)
 
     def play(self) -> None:
         """
@@ -124,13 +223,19 @@ class GameBoard:
         - render the board
         - blocking until user presses a key
         - check for and execute the appropriate move, if valid
+        - do the same for any other keys already waiting on `self.queue`, so held-down
+          keys don't leave the board rendering frames it has already fallen behind on
         """
         while True:
             self.render()
             user_input = self.queue.get()
-            if user_input not in self._valid_moves:
-                continue
-            self._valid_moves[user_input].action()
+            while True:
+                if user_input in self._valid_keys:
+                    self._valid_moves[user_input].action()
+                try:
+                    user_input = self.queue.get_nowait()
+                except Empty:
+                    break
 
     def _on_press(self, key):
         """
@@ -139,7 +244,7 @@ class GameBoard:
         Doesn't support any special keys. Places useful keystrokes on `self.queue`.
         """
         try:
-            if hasattr(key, "char") and key.char not in self._valid_moves:
+            if hasattr(key, "char") and key.char not in self._valid_keys:
                 return
             if hasattr(key, "char"):
                 self.queue.put(key.char)
@@ -148,98 +253,110 @@ class GameBoard:
             pass
 
 
-    def check_and_destroy_matches(self, x: int, y: int, letter: str, depth: int = 1) -> None:
+    def check_and_destroy_matches(self, x: int, y: int, depth: int = 1) -> None:
         """
-        Recursive method that:
-        1. Checks for matches horizontally and vertically at the given (x,y) coordinates (three pointer method)
+        Iterative method that works through a worklist of cells, starting with (x,y), and for each:
+        1. Checks for matches horizontally and vertically at that cell against the letter it holds
         2. Confirms matches in both directions exceed the `destroy_count` member, add those to a set for removal
         3. Increment the score (cascading crushes get a multiplier)
         4. Iteratively call to `drop_supported` to populate a list of new candidate cells for deletion (necessary because of cascades)
-        5. Calls itself with each new candidate coordinate pair and cascades crushes if needed
+        5. Pushes each new candidate coordinate pair to the front of the worklist, so cascades are
+           checked depth first in the same order the old recursive version visited them
             - The above could likely be memoized in some way to avoid redundant match-checking
 
         Arguments:
         - x: `int` - The location the check starts on the horizontal axis of the board
         - y: `int` - The location the check starts on the vertical axis of the board
-        - letter: `str` - The letter we are checking for matches against
         - depth: `int` - the score multiplier (for the case of cascading crushes)
 
         Modifies:
         `self.board`
         `self.score`
         """
-        if letter == "_":
-            return
+        board, w, h = self.board, self.width, self.height
+        pending = deque([(x, y, depth)])
+
+        while pending:
+            x, y, depth = pending.popleft()
+
+            # Candidates are read when popped, earlier cascades may have moved their letter
+            letter = board[x * h + y]
+            if letter == EMPTY:
+                continue
+
+            mask = RUN_MASKS[letter]
+            row = board[y::h].translate(mask)
+            col = board[x * h:(x + 1) * h].translate(mask)
+
+            # Look left for letter matches (-1 when the run reaches the edge)
+            left = row.rfind(b"\x01", 0, x)
 
-        # Look left for letter matches
-        left = x
-        while left >= 0 and self.board[(left, y)] == letter:
-            left -= 1
-
-        # Look right for letter matches
-        right = x 
-        while right < self.width and self.board[(right, y)] == letter:
-            right += 1
-
-        # Look down for letter matches
-        down = y
-        while down < self.height and self.board[(x, down)] == letter:
-            down += 1
-
-        destroyed = set()
-        # Confirm windows of matches are greater than `destroy_count`
-        if right - left > self.destroy_count:
-            for i in range(left + 1, right):
-                destroyed.add((i, y))
-        if down - y >= self.destroy_count:
-            for j in range(y, down):
-                destroyed.add((x, j))
-
-        # Update score
-        self.score += 10 * len(destroyed) * depth
-
-        new_candidates = []
-
-        # This sort is necessary for vertical crushes to work
-        for d_cell in sorted(destroyed, key=lambda x: x[1]):
-            # It is also necessary to do all possible drops before attempting cascading crushes
-            new_candidates.extend(self.drop_supported(d_cell))
-
-        # Recursively check and delete any new cascading matches
-        for cell in new_candidates:
-            x, y, letter = *cell, self.board[cell]
-            self.check_and_destroy_matches(x, y, letter, depth + 1)
+            # Look right for letter matches
+            right = row.find(b"\x01", x)
+            if right == -1:
+                right = w
+
+            # Look down for letter matches
+            down = col.find(b"\x01", y)
+            if down == -1:
+                down = h
+
+            destroyed = set()
+            # Confirm windows of matches are greater than `destroy_count`
+            if right - left > self.destroy_count:
+                destroyed.update(zip(range(left + 1, right), repeat(y)))
+            if down - y >= self.destroy_count:
+                destroyed.update(zip(repeat(x), range(y, down)))
+
+            # Update score
+            self.score += 10 * len(destroyed) * depth
+
+            new_candidates = []
+
+            # This sort is necessary for vertical crushes to work
+            for d_cell in sorted(destroyed, key=itemgetter(1)):
+                # It is also necessary to do all possible drops before attempting cascading crushes
+                new_candidates.extend(self.drop_supported(d_cell))
+
+            # Queue any new cascading matches ahead of the remaining work
+            pending.extendleft((cx, cy, depth + 1) for cx, cy in reversed(new_candidates))
 
     def drop_supported(self, d_cell: tuple[int, int]) -> list[tuple[int, int]]:
         """
-        This recursive method is responsible for taking an (x,y) coordinate pair and 'looking up'.
+        This method is responsible for taking an (x,y) coordinate pair and 'looking up'.
 
-        In the condition that we are already at the top of the board or the next cell up is already
-        empty, we can just set our current cell to empty (effectively dropping the existing value)
-        and return no new candidates for match checking.
-
-        Otherwise, the cell above the current coordinates contains a letter. In this case we drop
-        that value into our current cell and recursively (depth first) populate a new list of 
-        cells that we need to match check for deletion.
+        Every letter between the deleted cell and the first empty cell above it (or the top of
+        the board) drops down one row, and the topmost of those cells becomes empty. The shift
+        is a single slice assignment over the (contiguous) column, and since exactly the cells that
+        received a letter need match checking, the candidates follow directly from the bounds.
 
         Arguments:
         d_cell: `tuple[int, int]` - the (x,y) coordinate pair we need to 'delete'
 
+        Returns:
+        `list[tuple[int, int]]` - Cells that received a dropped letter, from the bottom up
+
         Modifies:
         `self.board`
+        `self._dirty`
+        `self._row_cache`
         """
+        board = self.board
         x, curr_y = d_cell
-        next_y = curr_y - 1
+        col = x * self.height
 
-        # If you're at the top or empty cell above, set current cell empty and return
-        if curr_y == 0 or self.board[(x, next_y)] == "_":
-            self.board[(x, curr_y)] = "_"
-            return []
+        # Nearest empty cell above (-1 when the column is full up to the top)
+        top = board.rfind(EMPTY, col, col + curr_y)
+        top = top - col if top != -1 else -1
 
-        # Some value exists above, move it down and recursively shift cells down
-        new_candidates = [(x, curr_y)]
-        self.board[(x, curr_y)] = self.board[(x, next_y)]
-        new_candidates.extend(self.drop_supported((x, next_y)))
+        # Move the supported letters down one row, then empty the highest of those cells
+        board[col + top + 2:col + curr_y + 1] = board[col + top + 1:col + curr_y]
+        board[col + top + 1] = EMPTY
+
+        new_candidates = [(x, j) for j in range(curr_y, top + 1, -1)]
+        self._row_cache[top + 1:curr_y + 1] = [None] * (curr_y - top)
+        self._dirty.update(new_candidates)
+        self._dirty.add((x, top + 1))
 
         # Return new possible candidates for match checking and cascading deletions
         return new_candidates
@@ -255,6 +372,7 @@ class GameBoard:
         if self.cursor == 0:
             return
         self.cursor -= 1
+        self._update_cursor_bars()
 
     def cursor_right(self) -> None:
         """
@@ -267,6 +385,7 @@ class GameBoard:
         if self.cursor == self.width - 1:
             return
         self.cursor += 1
+        self._update_cursor_bars()
 
     def drop_letter(self) -> None:
         """
@@ -274,25 +393,36 @@ class GameBoard:
 
         1. Checks where a letter should be set vertically
         2. Places the letter
-        3. Calls `check_and_destroy_matches` on that cell with that letter
+        3. Calls `check_and_destroy_matches` on that cell, unless no neighbour could start a run with it
         4. Updates the `current_letter` field
         5. Increments the `turn` member
 
         Modifies:
         `self.board` <- Indirectly via `check_and_destroy_matches`
+        `self._dirty`
+        `self._row_cache`
         `self.current_letter`
         `self.turn`
         """
-        y_check = self.height - 1
-
-        while y_check >= 0 and self.board[(self.cursor, y_check)] != "_":
-            y_check -= 1
+        # Lowest empty cell in the cursor's column, found with one scan over the column
+        col = self._idx(self.cursor, 0)
+        y_check = self.board.rfind(EMPTY, col, col + self.height)
+        y_check = y_check - col if y_check != -1 else -1
 
         if y_check == -1:
             return
 
-        self.board[(self.cursor, y_check)] = self.current_letter
-        self.check_and_destroy_matches(self.cursor, y_check, self.board[(self.cursor, y_check)])
+        board, h, x = self.board, self.height, self.cursor
+        letter = board[col + y_check] = ord(self.current_letter)
+        self._dirty.add((x, y_check))
+        self._row_cache[y_check] = None
+
+        # Any run through the new cell needs a matching neighbour to its left, right, or below
+        if (self.destroy_count <= 1
+                or (x > 0 and board[col - h + y_check] == letter)
+                or (x < self.width - 1 and board[col + h + y_check] == letter)
+                or (y_check < h - 1 and board[col + y_check + 1] == letter)):
+            self.check_and_destroy_matches(x, y_check)
         self.current_letter = self.get_letter()
         self.turn += 1
 
@@ -306,6 +436,8 @@ class GameBoard:
 
 
 def main():
+    # Frames are flushed explicitly by `GameBoard.render`, so don't flush on every newline
+    sys.stdout.reconfigure(line_buffering=False)
     GameBoard()
 
 if __name__ == "__main__":